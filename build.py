@@ -1,38 +1,92 @@
 import argparse
+import concurrent.futures
+import functools
+import glob
+import hashlib
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 import tomllib
 
+OLE32_PATTERN = re.compile(r"^([ \t]*)_ole32\.CoUninitialize\(\)", re.MULTILINE)
+PULSEAUDIO_PATTERN = re.compile(r"^([ \t]*)assert self\._pa_context_get_state", re.MULTILINE)
+PATCHED_SENTINEL = os.path.join(".venv", ".soundcard_patched")
+NUMPY_LITE_SENTINEL = os.path.join(".venv", ".numpy_lite_ok")
+CYTHON_OPTIONS_STAMP = ".cython_options"   # next to generated C code, build dir is removed by pyinstaller
+VENV_LOCK = threading.Lock()
+PYINSTALLER_PLATFORM_OPTIONS = {
+    "linux": [],
+    "win32": ["--console"],
+    "darwin": [],
+}
+NUITKA_PLATFORM_OPTIONS = {   # formatted with app name and version
+    "linux": [],
+    "win32": ["--assume-yes-for-downloads"],
+    "darwin": [
+        "--macos-app-name={name}",
+        "--macos-app-version={version}",
+        "--macos-app-protected-resource=NSMicrophoneUsageDescription:Microphone access for recording voice message.",
+    ],
+}
+PGO_WORKLOAD = """
+import numpy as np
+from spectrum_bands import get_bands
+from spectrum_cython import fall_bars, log_band_volumes, update_peaks
+numframes = 2205
+freqs = np.fft.rfftfreq(numframes, 1 / 44100)
+rng = np.random.default_rng(0)
+for num_bars in (80, 160, 320):
+    bands = get_bands(freqs, num_bars, 30, 16000)
+    bar_heights = np.zeros(num_bars, dtype=np.int32)
+    peak_heights = np.zeros(num_bars, dtype=np.int32)
+    peak_times = np.zeros(num_bars)
+    for frame in range(300):
+        data = rng.standard_normal(numframes).astype(np.float32)
+        db = log_band_volumes(np.fft.rfft(data).astype(np.complex64), bands, 20 * np.log10(3000))
+        raw_bar_heights = np.clip((db + 90) / 3, 0, 30).astype(np.int32)
+        fall_bars(bar_heights, raw_bar_heights, 2)
+        update_peaks(bar_heights, peak_heights, peak_times, frame * 0.05, 1.0)
+"""
+
+pyproject = None
+
+
+def load_pyproject():
+    """Load pyproject.toml, parsed only once per run"""
+    global pyproject
+    if pyproject is None:
+        try:
+            with open("pyproject.toml", "rb") as f:
+                pyproject = tomllib.load(f)
+        except FileNotFoundError:
+            print("pyproject.toml file not found")
+            sys.exit()
+    return pyproject
+
 
 def get_app_name():
     """Get app name from pyproject.toml"""
-    if os.path.exists("pyproject.toml"):
-        with open("pyproject.toml", "rb") as f:
-            data = tomllib.load(f)
-        if "project" in data and "version" in data["project"]:
-            return str(data["project"]["name"])
-        print("App name not specified in pyproject.toml")
-        sys.exit()
-    print("pyproject.toml file not found")
+    data = load_pyproject()
+    if "project" in data and "name" in data["project"]:
+        return str(data["project"]["name"])
+    print("App name not specified in pyproject.toml")
     sys.exit()
 
 
 def get_version_number():
     """Get version number from pyproject.toml"""
-    if os.path.exists("pyproject.toml"):
-        with open("pyproject.toml", "rb") as f:
-            data = tomllib.load(f)
-        if "project" in data and "version" in data["project"]:
-            return str(data["project"]["version"])
-        print("Version not specified in pyproject.toml")
-        sys.exit()
-    print("pyproject.toml file not found")
+    data = load_pyproject()
+    if "project" in data and "version" in data["project"]:
+        return str(data["project"]["version"])
+    print("Version not specified in pyproject.toml")
     sys.exit()
 
 
+@functools.cache
 def supports_color():
     """Return True if the running terminal supports ANSI colors."""
     if sys.platform == "win32":
@@ -46,32 +100,123 @@ def supports_color():
     return os.getenv("TERM", "") != "dumb"
 
 
-PKGNAME = get_app_name()
-PKGVER = get_version_number()
-USE_COLOR = supports_color()
-
-
-def fprint(text, color_code="\033[1;35m", prepend=f"[{PKGNAME.capitalize()} Build Script]: "):
-    """Print colored text prepended with text, default is light purple"""
-    if USE_COLOR:
+def fprint(text, color_code="\033[1;35m", prepend=None):
+    """Print colored text prepended with text, default is light purple and build script name"""
+    if prepend is None:
+        prepend = f"[{get_app_name().capitalize()} Build Script]: "
+    if supports_color():
         print(f"{color_code}{prepend}{text}\033[0m")
     else:
         print(f"{prepend}{text}")
 
 
-def find_file_in_venv(lib_name, file_name):
-    """Search for file in specified library in current venv"""
-    if isinstance(file_name, list):
-        file_name = os.path.join(*file_name)
-    for root, dirs, files in os.walk(".venv"):
-        if lib_name in dirs:
-            lib_dir = os.path.join(root, lib_name)
-            path = os.path.join(lib_dir, file_name)
+def get_site_packages():
+    """Get list of site-packages directories in current venv"""
+    if sys.platform == "win32":
+        return [os.path.join(".venv", "Lib", "site-packages")]
+    return glob.glob(os.path.join(".venv", "lib", "python*", "site-packages"))
+
+
+def get_install_id(lib_name):
+    """
+    Get id of library installed in current venv: version from its dist-info directory name
+    Modification time of dist-info directory is appended so reinstall of same version is detected
+    """
+    for site_packages in get_site_packages():
+        for path in glob.glob(os.path.join(site_packages, f"{lib_name}-*.dist-info")):
+            version = os.path.basename(path)[len(lib_name) + 1:-len(".dist-info")]
+            return f"{version} {os.stat(path).st_mtime_ns}"
+    return None
+
+
+def scan_dir(top, lib_name, file_name):
+    """Recursively search directory for file in specified library, stop on first hit"""
+    try:
+        entries = list(os.scandir(top))
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.name == lib_name and entry.is_dir(follow_symlinks=False):
+            path = os.path.join(entry.path, file_name)
             if os.path.isfile(path):
                 return path
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            path = scan_dir(entry.path, lib_name, file_name)
+            if path:
+                return path
+    return None
+
+
+def find_lib_in_venv(lib_name):
+    """Search for specified library directory in current venv"""
+    # probe site-packages directly
+    for site_packages in get_site_packages():
+        path = os.path.join(site_packages, lib_name)
+        if os.path.isdir(path):
+            return path
+
+    # fallback to searching whole venv
+    path = scan_dir(".venv", lib_name, "__init__.py")
+    if path:
+        return os.path.dirname(path)
+    fprint(f"{lib_name} not found in .venv")
+    return None
+
+
+def file_hash(data):
+    """Get hash of file contents"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def load_patched_hashes():
+    """Load hashes of already patched files from sentinel file"""
+    hashes = {}
+    try:
+        with open(PATCHED_SENTINEL, "r", encoding="utf-8") as f:
+            for line in f:
+                path, _, data_hash = line.rstrip("\n").rpartition(" ")
+                hashes[path] = data_hash
+    except FileNotFoundError:
+        pass
+    return hashes
+
+
+def patch_file(path, pattern, marker, replacement):
+    """
+    Replace first line matching pattern with replacement, formatted with indentation of that line
+    Marker is plain text that pattern requires, used to quickly reject files before running regex
+    File is rewritten through temporary file in the same directory, return True if file is changed
+    Hash of checked file is stored in sentinel file, so it is not scanned again if unchanged
+    """
+    hashes = load_patched_hashes()
+    with open(path, "rb") as f:
+        data = f.read()
+    if hashes.get(path) == file_hash(data):
+        return False
+
+    text = data.decode("utf-8").replace("\r\n", "\n")
+    patched_line = replacement.format(indent="").split("\n", 1)[0]
+    if marker not in text or patched_line in text:
+        match = None
     else:
-        fprint(f"{lib_name}/{file_name} not found")
-        return
+        match = pattern.search(text)
+    if match:
+        line_end = text.find("\n", match.start())
+        line_end = len(text) if line_end == -1 else line_end + 1
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path), delete=False) as f:
+            f.write(text[:match.start()])
+            f.write(replacement.format(indent=match.group(1)))
+            f.write(text[line_end:])
+        shutil.copymode(path, f.name)
+        os.replace(f.name, path)
+        with open(path, "rb") as f:
+            data = f.read()
+
+    hashes[path] = file_hash(data)
+    with open(PATCHED_SENTINEL, "w", encoding="utf-8") as f:
+        f.writelines(f"{hashed_path} {data_hash}\n" for hashed_path, data_hash in hashes.items())
+    return bool(match)
 
 
 def patch_soundcard():
@@ -85,54 +230,41 @@ def patch_soundcard():
         fprint(".venv dir not found")
         return
 
-    # patch mediafoundation.py
-    path = find_file_in_venv("soundcard", "mediafoundation.py")
-    if not path:
+    lib_dir = find_lib_in_venv("soundcard")
+    if not lib_dir:
         return
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    pattern = re.compile(r"^(\s*)_ole32\.CoUninitialize\(\)")
-    changed = False
-    for num, line in enumerate(lines):
-        match = re.match(pattern, line)
-        if match:
-            indent = match.group(1)
-            lines[num] = f"{indent}if _ole32: _ole32.CoUninitialize()\n"
-            changed = True
-            break
-
-    if changed:
-        with open(path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        fprint(f"Patched file: {path}")
-    else:
-        fprint(f"Nothing to patch in file {path}")
 
-    # patch pulseaudio.py
-    path = find_file_in_venv("soundcard", "pulseaudio.py")
-    if not path:
-        return
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    pattern = re.compile(r"^(\s*)assert self\._pa_context_get_state")
-    changed = False
-    for num, line in enumerate(lines):
-        match = re.match(pattern, line)
-        if match:
-            indent = match.group(1)
-            lines[num] = f"{indent}if self._pa_context_get_state(self.context) != _pa.PA_CONTEXT_READY:\n"
-            lines.insert(num+1, f'{indent+"    "}raise RuntimeError("PulseAudio context not ready (no sound system?)")\n')
-            changed = True
-            break
-
-    if changed:
-        with open(path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        fprint(f"Patched file: {path}")
-    else:
-        fprint(f"Nothing to patch in file {path}")
+    patches = (
+        (
+            "mediafoundation.py",
+            OLE32_PATTERN,
+            "_ole32.CoUninitialize()",
+            "{indent}if _ole32: _ole32.CoUninitialize()\n",
+        ),
+        (
+            "pulseaudio.py",
+            PULSEAUDIO_PATTERN,
+            "assert self._pa_context_get_state",
+            "{indent}if self._pa_context_get_state(self.context) != _pa.PA_CONTEXT_READY:\n"
+            '{indent}    raise RuntimeError("PulseAudio context not ready (no sound system?)")\n',
+        ),
+    )
+    for file_name, pattern, marker, replacement in patches:
+        path = os.path.join(lib_dir, file_name)
+        if not os.path.isfile(path):
+            fprint(f"soundcard/{file_name} not found")
+        elif patch_file(path, pattern, marker, replacement):
+            fprint(f"Patched file: {path}")
+        else:
+            fprint(f"Nothing to patch in file {path}")
+
+
+def write_numpy_lite_sentinel():
+    """Store installed numpy id so next build can skip numpy lite detection"""
+    install_id = get_install_id("numpy")
+    if install_id:
+        with open(NUMPY_LITE_SENTINEL, "w", encoding="utf-8") as f:
+            f.write(install_id)
 
 
 def build_numpy_lite(clang):
@@ -141,53 +273,64 @@ def build_numpy_lite(clang):
         fprint("Skipping numpy lite (no openblas) building on non-linux platforms")
         return
 
+    # check if numpy lite was already built for currently installed numpy
+    install_id = get_install_id("numpy")
+    if install_id and os.path.exists(NUMPY_LITE_SENTINEL):
+        with open(NUMPY_LITE_SENTINEL, "r", encoding="utf-8") as f:
+            if f.read().strip() == install_id:
+                fprint("Numpy lite (no openblas) is already built")
+                return
+
     # check if numpy without blas is not already installed
     cmd = [
         "uv", "run", "python", "-c",
         "import numpy; print(int(numpy.__config__.show_config('dicts')['Build Dependencies']['blas'].get('found', False)))",
     ]
-    if int(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip()):
+    if subprocess.run(cmd, capture_output=True, check=True).stdout.strip() == b"1":
         fprint("Building numpy lite (no openblas)")
         if clang:
             os.environ["CC"] = "clang"
             os.environ["CXX"] = "clang++"
-        subprocess.run(["uv", "pip", "install", "pip"], check=True)   # because uv wont work with --config-settings as intended
+        if not get_install_id("pip"):   # because uv wont work with --config-settings as intended
+            subprocess.run(["uv", "pip", "install", "pip"], check=True)
         try:
             if sys.platform == "win32":
                 python_interpreter = r".venv\Scripts\python.exe"
             else:
                 python_interpreter = ".venv/bin/python"
-            subprocess.run([python_interpreter, "-m", "pip", "uninstall", "--yes", "numpy"], check=True)
-            subprocess.run([
-                python_interpreter, "-m", "pip", "install", "--no-cache-dir", "--no-binary=:all:", "numpy",
-                "--config-settings=setup-args=-Dblas=None",
-                "--config-settings=setup-args=-Dlapack=None",
-            ], check=True)
+            with tempfile.TemporaryDirectory() as wheel_dir:
+                # building wheel does not touch venv, so it can run alongside cython build
+                subprocess.run([
+                    python_interpreter, "-m", "pip", "wheel", "--no-deps",
+                    "--no-cache-dir", "--no-binary=:all:", "numpy",
+                    "--config-settings=setup-args=-Dblas=None",
+                    "--config-settings=setup-args=-Dlapack=None",
+                    f"--wheel-dir={wheel_dir}",
+                ], check=True)
+                with VENV_LOCK:
+                    subprocess.run([
+                        python_interpreter, "-m", "pip", "install", "--force-reinstall", "--no-deps",
+                        *glob.glob(os.path.join(wheel_dir, "numpy-*.whl")),
+                    ], check=True)
+            write_numpy_lite_sentinel()
         except subprocess.CalledProcessError:   # fallback
             fprint("Failed building numpy lite (no openblas), faling back to default numpy")
-            subprocess.run(["uv", "pip", "install", "numpy"], check=True)
-        subprocess.run(["uv", "pip", "uninstall", "pip"], check=True)
+            with VENV_LOCK:
+                subprocess.run(["uv", "pip", "install", "numpy"], check=True)
     else:
+        write_numpy_lite_sentinel()
         fprint("Numpy lite (no openblas) is already built")
 
 
-def build_cython(clang, mingw):
-    """Build cython extensions"""
-    fprint(f"Compiling cython code with {"clang" if clang else "gcc"}{("mingw") if mingw else ""}")
-    cmd = ["uv", "run", "python", "setup.py", "build_ext", "--inplace"]
-    if clang:
-        os.environ["CC"] = "clang"
-        os.environ["CXX"] = "clang++"
-    elif mingw and sys.platform == "win32":
-        cmd.append("--compiler=mingw32")   # covers mingw 32 and 64
-
-    # run process with control of stdout
+def run_setup(cmd, env):
+    """Run setup.py command with control of stdout"""
     process = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
         bufsize=1,
+        env=env,
     )
     for line in process.stdout:
         line_clean = line.rstrip("\n")
@@ -197,8 +340,81 @@ def build_cython(clang, mingw):
     if process.returncode != 0:
         raise subprocess.CalledProcessError(process.returncode, cmd)
 
-    os.remove("spectrum_cython.c")
-    shutil.rmtree("build")
+
+def build_cython(clang, mingw, native=False, openmp=False, pgo=False, clean=False):
+    """
+    Build cython extensions, optionally with profile guided optimization
+    Generated C code and build dir are kept unless clean, so unchanged extensions are not rebuilt
+    Options used for last build are stored next to generated C code, and extensions are rebuilt when they change
+    """
+    fprint(f"Compiling cython code with {"clang" if clang else "gcc"}{("mingw") if mingw else ""}")
+    cmd = ["uv", "run", "python", "setup.py", "build_ext", "--inplace", f"--parallel={os.cpu_count() or 1}"]
+    if clang:
+        os.environ["CC"] = "clang"
+        os.environ["CXX"] = "clang++"
+    elif mingw and sys.platform == "win32":
+        cmd.append("--compiler=mingw32")   # covers mingw 32 and 64
+    options = f"clang={clang} mingw={mingw and not clang and sys.platform == "win32"} native={native} openmp={openmp}"
+    try:
+        with open(CYTHON_OPTIONS_STAMP, encoding="utf-8") as f:
+            options_changed = f.read() != options
+    except FileNotFoundError:
+        options_changed = True
+    if clean or pgo or options_changed:
+        cmd.append("--force")
+    env = os.environ.copy()
+    if native:
+        env["SPECTROTERM_NATIVE"] = "1"
+    if openmp:
+        env["SPECTROTERM_OPENMP"] = "1"
+
+    # numpy in venv must not change while compiling against it
+    with VENV_LOCK:
+        if pgo:
+            pgo_dir = os.path.abspath("pgo")
+            shutil.rmtree(pgo_dir, ignore_errors=True)
+            fprint("Compiling instrumented cython code for profile guided optimization")
+            run_setup(cmd, env | {"SPECTROTERM_PGO": "generate", "SPECTROTERM_PGO_PATH": pgo_dir})
+            fprint("Running profiling workload")
+            subprocess.run(["uv", "run", "python", "-c", PGO_WORKLOAD], check=True)
+            if clang:   # clang needs raw profiles merged before use
+                profile = os.path.join(pgo_dir, "default.profdata")
+                subprocess.run(["llvm-profdata", "merge", f"-output={profile}", *glob.glob(os.path.join(pgo_dir, "*.profraw"))], check=True)
+            else:
+                profile = pgo_dir
+            fprint("Compiling optimized cython code with collected profile")
+            run_setup(cmd, env | {"SPECTROTERM_PGO": "use", "SPECTROTERM_PGO_PATH": profile})
+            shutil.rmtree(pgo_dir)
+        else:
+            run_setup(cmd, env)
+
+    if clean:
+        os.remove("spectrum_cython.c")
+        shutil.rmtree("build")
+        if os.path.exists(CYTHON_OPTIONS_STAMP):
+            os.remove(CYTHON_OPTIONS_STAMP)
+    else:
+        with open(CYTHON_OPTIONS_STAMP, "w", encoding="utf-8") as f:
+            f.write(options)
+
+
+def run_build(cmd, tool, pkgname):
+    """Run build command and clean up after it"""
+    fprint(f"Starting {tool}")
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Build failed: {e}")
+        sys.exit(e.returncode)
+
+    # cleanup
+    fprint("Cleaning up")
+    try:
+        os.remove(f"{pkgname}.spec")
+        shutil.rmtree("build")
+    except FileNotFoundError:
+        pass
+    fprint(f"Finished building {pkgname}")
 
 
 def build_with_pyinstaller(onedir):
@@ -209,14 +425,7 @@ def build_with_pyinstaller(onedir):
     exclude_imports = ["--exclude-module=cython"]
     package_data = []
 
-    # platform-specific
-    if sys.platform == "linux":
-        options = []
-    elif sys.platform == "win32":
-        options = ["--console"]
-    elif sys.platform == "darwin":
-        options = []
-
+    options = PYINSTALLER_PLATFORM_OPTIONS[sys.platform]   # platform-specific
 
     # prepare command and run it
     cmd = [
@@ -231,36 +440,18 @@ def build_with_pyinstaller(onedir):
         f"--name={pkgname}",
         "main.py",
     ]
-    cmd = [arg for arg in cmd if arg != ""]
-    fprint("Starting pyinstaller")
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Build failed: {e}")
-        sys.exit(e.returncode)
-
-    # cleanup
-    fprint("Cleaning up")
-    try:
-        os.remove(f"{pkgname}.spec")
-        shutil.rmtree("build")
-    except FileNotFoundError:
-        pass
-    fprint(f"Finished building {pkgname}")
+    run_build(cmd, "pyinstaller", pkgname)
 
 
 def build_with_nuitka(onedir, clang, mingw):
     """Build with nuitka"""
     pkgname = get_app_name()
-
-    build_numpy_lite(clang)
-
     mode = "--standalone" if onedir else "--onefile"
-    compiler = ""
+    compiler = []
     if clang:
-        compiler = "--clang"
+        compiler = ["--clang"]
     elif mingw:
-        compiler = "--mingw64"
+        compiler = ["--mingw64"]
     python_flags = ["--python-flag=-OO"]
     hidden_imports = ["--include-module=pyfftw"]
     exclude_imports = ["--nofollow-import-to=cython"]
@@ -271,23 +462,15 @@ def build_with_nuitka(onedir, clang, mingw):
         os.environ["CFLAGS"] = "-Wno-macro-redefined"
 
     # platform-specific
-    if sys.platform == "linux":
-        options = []
-    elif sys.platform == "win32":
+    if sys.platform == "win32":
         patch_soundcard()
-        options = ["--assume-yes-for-downloads"]
-    elif sys.platform == "darwin":
-        options = [
-            f"--macos-app-name={get_app_name()}",
-            f"--macos-app-version={get_version_number()}",
-            "--macos-app-protected-resource=NSMicrophoneUsageDescription:Microphone access for recording voice message.",
-        ]
+    options = [option.format(name=pkgname, version=get_version_number()) for option in NUITKA_PLATFORM_OPTIONS[sys.platform]]
 
     # prepare command and run it
     cmd = [
         "uv", "run", "python", "-m", "nuitka",
         mode,
-        compiler,
+        *compiler,
         *python_flags,
         *hidden_imports,
         *exclude_imports,
@@ -299,29 +482,14 @@ def build_with_nuitka(onedir, clang, mingw):
         f"--output-filename={pkgname}",
         "main.py",
     ]
-    cmd = [arg for arg in cmd if arg != ""]
-    fprint("Starting nuitka")
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Build failed: {e}")
-        sys.exit(e.returncode)
-
-    # cleanup
-    fprint("Cleaning up")
-    try:
-        os.remove(f"{pkgname}.spec")
-        shutil.rmtree("build")
-    except FileNotFoundError:
-        pass
-    fprint(f"Finished building {pkgname}")
+    run_build(cmd, "nuitka", pkgname)
 
 
 def parser():
     """Setup argument parser for CLI"""
     parser = argparse.ArgumentParser(
         prog="build.py",
-        description=f"build script for {PKGNAME}",
+        description=f"build script for {get_app_name()}",
     )
     parser._positionals.title = "arguments"
     parser.add_argument(
@@ -344,6 +512,26 @@ def parser():
         action="store_true",
         help="build without compiling cython code",
     )
+    parser.add_argument(
+        "--clean-cython",
+        action="store_true",
+        help="rebuild cython code from scratch and remove generated files afterwards, use for release builds",
+    )
+    parser.add_argument(
+        "--native",
+        action="store_true",
+        help="optimize cython code for cpu of this machine, executable may not run on other machines",
+    )
+    parser.add_argument(
+        "--openmp",
+        action="store_true",
+        help="build cython code with openmp, splits spectrum bands calculation between cpu threads",
+    )
+    parser.add_argument(
+        "--pgo",
+        action="store_true",
+        help="build cython code with profile guided optimization, compiles it twice",
+    )
     parser.add_argument(
         "--mingw",
         action="store_true",
@@ -356,11 +544,19 @@ if __name__ == "__main__":
     args = parser()
     if sys.platform not in ("linux", "win32", "darwin"):
         sys.exit(f"This platform is not supported: {sys.platform}")
-    if not args.nocython:
-        try:
-            build_cython(args.clang, args.mingw)
-        except Exception as e:
-            print(f"Failed building cython extensions, error: {e}")
+
+    # cython and numpy lite builds are independent, only venv changes are serialized by VENV_LOCK
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        numpy_lite_job = executor.submit(build_numpy_lite, args.clang) if args.nuitka else None
+        cython_job = None if args.nocython else executor.submit(build_cython, args.clang, args.mingw, args.native, args.openmp, args.pgo, args.clean_cython)
+        if cython_job:
+            try:
+                cython_job.result()
+            except Exception as e:
+                print(f"Failed building cython extensions, error: {e}")
+        if numpy_lite_job:
+            numpy_lite_job.result()
+
     if args.nuitka:
         build_with_nuitka(args.onedir, args.clang, args.mingw)
         sys.exit()
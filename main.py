@@ -9,86 +9,91 @@ import time
 from collections import deque
 
 import numpy as np
+import pyfftw
 import soundcard as sc
-from pyfftw.interfaces.numpy_fft import rfft
-
-
-def log_band_volumes(data, freqs, num_bands, band_edges, max_ref):
-    """Get logarythmic volume in dB for specified number of bands, from sound sample, with interpolation between bands"""
-    # get magnitude from fft
-    raw_magnitude = np.abs(rfft(data, threads=1))
-
-    # split into logarithmic bands
-    magnitude = np.zeros(num_bands)
-    for i in range(num_bands):
-        left = band_edges[i]
-        right = band_edges[i+1]
-        idx = np.where((freqs >= left) & (freqs < right))[0]
-
-        # interpolate between bands
-        if len(idx) == 0:
-            left_bin = np.searchsorted(freqs, left)
-            right_bin = np.searchsorted(freqs, right)
-            bins = []
-            if left_bin > 0:
-                bins.append(left_bin - 1)
-            if left_bin < len(freqs):
-                bins.append(left_bin)
-            if right_bin > 0 and right_bin != left_bin:
-                bins.append(right_bin - 1)
-            if right_bin < len(freqs) and right_bin != left_bin:
-                bins.append(right_bin)
-            bins = np.array(list(set(bins)))
-            weights = []
-            for b in bins:
-                center = freqs[b]
-                band_center = (left + right) / 2
-                d = abs(center - band_center) + 1e-6
-                weights.append(1/d)
-            weights = np.array(weights)
-            weights /= np.sum(weights)
-            magnitude[i] = np.sqrt(np.sum((raw_magnitude[bins]**2) * weights))   # weighted RMS
-        else:
-            magnitude[i] = np.sqrt(np.mean(raw_magnitude[idx]**2))   # RMS
-
-    # magnitude to negative dB
-    db = 20 * np.log10(magnitude / max_ref + 1e-12)    # add small value to avoid log(0)
-    return np.maximum(db, -90)
+
+from spectrum_bands import get_bands
+
+
+def log_band_volumes(spectrum, bands, log_ref):
+    """
+    Get logarythmic volume in dB for precomputed bands, from fft of sound sample, with interpolation between bands
+    log_ref is reference maximum in dB, returned array is overwritten on next call with same bands
+    """
+    edges, counts, empty, left_bins, right_bins, left_weights, right_weights, db = bands
+
+    # get power from fft, padded with zero so reduceat can take index of last edge
+    num_bins = len(spectrum)
+    power = np.zeros(num_bins + 1, dtype=np.float32)
+    power[:num_bins] = spectrum.real * spectrum.real + spectrum.imag * spectrum.imag
+
+    # mean power for bands with bins, weighted mean power for empty bands
+    sums = np.add.reduceat(power, edges)[:len(counts)]
+    interpolated = power[left_bins] * left_weights + power[right_bins] * right_weights
+    np.divide(sums, counts, out=db)
+    np.copyto(db, interpolated, where=empty)
+
+    # power to negative dB, 10*log10(power) is same as 20*log10(RMS)
+    db += 1e-12   # add small value to avoid log(0)
+    np.log10(db, out=db)
+    db *= 10
+    db -= log_ref
+    return np.maximum(db, -90, out=db)
+
+
+def fall_bars(bar_heights, raw_bar_heights, max_fall):
+    """Lower bars by at most max_fall but not below new raw heights, in place"""
+    np.maximum(raw_bar_heights, bar_heights - max_fall, out=bar_heights)
+
+
+def update_peaks(bar_heights, peak_heights, peak_times, now, peak_hold):
+    """Reset peak markers to bar when bar is higher or hold time expired, in place"""
+    update = (bar_heights > peak_heights) | (now - peak_times > peak_hold)
+    peak_heights[update] = bar_heights[update]
+    peak_times[update] = now
+
+
+color_pairs = []
 
 
 def get_color(y, bar_height, use_color):
     """Get color id by bar height"""
     if not use_color:
-        return curses.color_pair(0)
+        return color_pairs[0]
     relative = (bar_height - y) / bar_height
     if relative < 0.5:
-        return curses.color_pair(1)   # green
+        return color_pairs[1]   # green
     if relative < 0.8:
-        return curses.color_pair(2)   # yellow
-    return curses.color_pair(3)   # red
+        return color_pairs[2]   # yellow
+    return color_pairs[3]   # red
 
 
-def draw_spectrum(spectrum_win, bar_heights, peak_heights, bar_height, bar_character, peak_character, peaks, color, box):
+def get_row_colors(bar_height, use_color):
+    """Get color id for each row of spectrum"""
+    return [get_color(y, bar_height, use_color) for y in range(bar_height)]
+
+
+def draw_spectrum(spectrum_win, bar_heights, peak_heights, bar_height, bar_character, peak_character, peaks, row_colors, box):
     """Draw spectrum bars with peaks"""
-    width = bar_heights.shape[0]
-    for y in range(bar_height - box):
-        line = [" "] * width
-        for i in range(width):
-            bar = bar_heights[i]
-            if y >= bar_height - bar:
-                line[i] = bar_character
-        if peaks:
-            for x in range(width):
-                peak = peak_heights[x]
-                if y == bar_height - peak:
-                    line[x] = peak_character
-        spectrum_win.insstr(y, 0, "".join(line), get_color(y, bar_height, color))
-        spectrum_win.refresh()
+    rows = np.arange(bar_height - box)[:, None]
+    grid = np.where(rows >= bar_height - bar_heights, bar_character, " ")
+    if peaks:
+        grid[rows == bar_height - peak_heights] = peak_character
+    # view each row of characters as single fixed width string
+    lines = grid.view(f"U{grid.shape[1]}")[:, 0]
+    for y, line in enumerate(lines):
+        spectrum_win.insstr(y, 0, line, row_colors[y])
+    spectrum_win.refresh()
 
 
 # use cython if available
 if importlib.util.find_spec("spectrum_cython"):
-    from spectrum_cython import draw_spectrum, log_band_volumes
+    from spectrum_cython import (
+        draw_spectrum,
+        fall_bars,
+        log_band_volumes,
+        update_peaks,
+    )
 
 
 pw_loopback = None
@@ -155,9 +160,14 @@ def connect_pipewire(output_node_name, target_node_name=None, only_get_name=Fals
     return "spectroterm"
 
 
-def db_to_height(db, min_db, max_db, bar_height):
-    """Calculate height of bars from sound volume"""
-    return np.clip(np.round(np.interp(db, (min_db, max_db), (0, bar_height))).astype(np.int32), 0, bar_height)
+def db_to_height(db, min_db, max_db, bar_height, scaled, heights):
+    """Calculate height of bars from sound volume, in place using preallocated float32 and int32 buffers"""
+    np.subtract(db, min_db, out=scaled)
+    scaled *= bar_height / (max_db - min_db)
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, 0, bar_height, out=scaled)
+    np.copyto(heights, scaled, casting="unsafe")
+    return heights
 
 
 def draw_log_x_axis(screen, num_bars, x, h, min_freq, max_freq, have_box=True):
@@ -174,7 +184,7 @@ def draw_log_x_axis(screen, num_bars, x, h, min_freq, max_freq, have_box=True):
                     label = str(round(freq))
                 if pos < num_bars - 5:
                     screen.addstr(h - 1 - have_box, x + pos, label)
-        screen.addstr(h - 1 - have_box, x + num_bars - 3 + have_box * 2, "Hz")
+    screen.addstr(h - 1 - have_box, x + num_bars - 3 + have_box * 2, "Hz")
 
 
 def draw_log_y_axis(screen, bar_height, min_db, max_db, have_box=True):
@@ -210,8 +220,27 @@ def draw_ui(screen, draw_box, draw_axes, min_freq, max_freq, min_db, max_db):
     return spectrum_win
 
 
+def setup_spectrum(screen, draw_box, draw_axes, freqs, min_freq, max_freq, min_db, max_db, use_color):
+    """Draw UI and allocate spectrum state for current window size"""
+    spectrum_win = draw_ui(screen, draw_box, draw_axes, min_freq, max_freq, min_db, max_db)
+    bar_height, num_bars = spectrum_win.getmaxyx()
+    return (
+        spectrum_win,
+        bar_height,
+        get_bands(freqs, num_bars, min_freq, max_freq),
+        get_row_colors(bar_height, use_color),
+        np.zeros(num_bars, dtype=np.int32),   # bar heights
+        np.zeros(num_bars, dtype=np.int32),   # peak heights
+        np.full(num_bars, time.perf_counter()),   # peak times
+        np.full(num_bars, -90, dtype=np.float32),   # silence
+        np.empty(num_bars, dtype=np.float32),   # scaled dB buffer
+        np.empty(num_bars, dtype=np.int32),   # raw bar heights buffer
+    )
+
+
 def main(screen, args):
     """Main app function"""
+    global color_pairs
     curses.curs_set(0)
     screen.nodelay(True)
     curses.start_color()
@@ -227,7 +256,6 @@ def main(screen, args):
     peak_character = args.peak_character[0]
     sample_rate = args.sample_rate
     sample_size = args.sample_size / 1000
-    reference_max = args.reference_max
     peak_hold = args.peak_hold / 1000
     min_freq = args.min_freq
     max_freq = args.max_freq
@@ -242,19 +270,22 @@ def main(screen, args):
         curses.init_pair(1, args.green, -1)
         curses.init_pair(2, args.orange, -1)
         curses.init_pair(3, args.red, -1)
+    color_pairs = [curses.color_pair(i) for i in range(4)]
 
     # detect bluetooth device
     if args.bt_delay:
         if "blue" in sc.default_speaker().id:
             delay = args.bt_delay
 
-    prev_bar_heights = None
     prev_update_time = time.perf_counter()
-    peak_heights = np.array([], dtype="int32")
     numframes = int(sample_rate * sample_size)
     delay_frames = int(sample_rate * delay / 1000)
     freqs = np.fft.rfftfreq(numframes, 1 / sample_rate)
 
+    # hann window reduces spectral leakage, reference dB is lowered by its mean power to keep levels
+    window = np.hanning(numframes).astype(np.float32)
+    log_ref = 20 * np.log10(args.reference_max) + 10 * np.log10(np.mean(window ** 2))
+
     # get loopback device
     if pipewire_fix:
         mic_id = connect_pipewire(sc.default_speaker().id, pipewire_node_id)
@@ -264,17 +295,18 @@ def main(screen, args):
         mic_id = sc.default_speaker().name
     loopback_mic = sc.get_microphone(mic_id, include_loopback=True)
 
+    # fft size never changes, so plan is measured once on aligned buffers and reused for every frame
+    fft_input = pyfftw.empty_aligned(numframes, dtype="float32")
+    fft_output = pyfftw.empty_aligned(numframes // 2 + 1, dtype="complex64")
+    fft = pyfftw.FFTW(fft_input, fft_output, flags=("FFTW_MEASURE", "FFTW_DESTROY_INPUT"), threads=1)
+
     try:
         with loopback_mic.recorder(samplerate=sample_rate, channels=1, blocksize=numframes) as rec:
-            h, w = screen.getmaxyx()
-            spectrum_win = draw_ui(screen, box, axes, min_freq, max_freq, min_db, max_db)
-            bar_height, num_bars = spectrum_win.getmaxyx()
-            band_edges = np.logspace(np.log10(min_freq), np.log10(max_freq), num_bars + 1)
-            silence = np.repeat(-90.0, num_bars)
+            spectrum_win, bar_height, bands, row_colors, bar_heights, peak_heights, peak_times, silence, scaled_db, raw_bar_heights = setup_spectrum(screen, box, axes, freqs, min_freq, max_freq, min_db, max_db, color)
 
             if delay:
                 buffer = deque()
-                buffer.extend(np.array_split(np.zeros((delay_frames)), delay_frames // numframes))
+                buffer.extend(np.array_split(np.zeros(delay_frames, dtype=np.float32), delay_frames // numframes))
 
             while True:
                 # handle input
@@ -282,63 +314,39 @@ def main(screen, args):
                 if key == 113:
                     break
                 elif key == curses.KEY_RESIZE:
-                    h, w = screen.getmaxyx()
-                    spectrum_win = draw_ui(screen, box, axes, min_freq, max_freq, min_db, max_db)
-                    bar_height, num_bars = spectrum_win.getmaxyx()
-                    band_edges = np.logspace(np.log10(min_freq), np.log10(max_freq), num_bars + 1)
-                    silence = np.repeat(-90, num_bars)
+                    spectrum_win, bar_height, bands, row_colors, bar_heights, peak_heights, peak_times, silence, scaled_db, raw_bar_heights = setup_spectrum(screen, box, axes, freqs, min_freq, max_freq, min_db, max_db, color)
 
                 # get and process data
                 if delay:
-                    buffer.append(rec.record(numframes=numframes).flatten())
+                    buffer.append(rec.record(numframes=numframes).ravel())
                     data = buffer.popleft()
                 else:
-                    data = rec.record(numframes=numframes).flatten()
+                    data = rec.record(numframes=numframes).ravel()
                 # skip calculations if all data is zero
                 if data.any():
-                    db = log_band_volumes(data, freqs, num_bars, band_edges, reference_max)
+                    np.multiply(data, window, out=fft_input)
+                    fft()
+                    db = log_band_volumes(fft_output, bands, log_ref)
                 else:
                     db = silence
                 # calculate heights on screen
-                raw_bar_heights = db_to_height(db, min_db, max_db, bar_height)
+                db_to_height(db, min_db, max_db, bar_height, scaled_db, raw_bar_heights)
 
                 # falling bars
                 now = time.perf_counter()
                 dt = now - prev_update_time
                 prev_update_time = now
-                if prev_bar_heights is None or len(prev_bar_heights) != len(raw_bar_heights):
-                    prev_bar_heights = raw_bar_heights.copy()
-                else:
-                    max_fall = int(fall_speed * dt)
-                    for i in range(len(raw_bar_heights)):
-                        if raw_bar_heights[i] >= prev_bar_heights[i]:
-                            prev_bar_heights[i] = raw_bar_heights[i]
-                        else:
-                            prev_bar_heights[i] = max(raw_bar_heights[i], prev_bar_heights[i] - max_fall)
-                bar_heights = prev_bar_heights
-
-                # peak marker
+                fall_bars(bar_heights, raw_bar_heights, int(fall_speed * dt))
+
+                # peak marker, reset to bar when bar is higher or hold time expired
                 if peaks:
-                    if len(peak_heights) != len(bar_heights):
-                        peak_heights = bar_heights.copy()
-                        peak_times = [now] * len(bar_heights)
-                    for i, bh in enumerate(bar_heights):
-                        if bh > peak_heights[i]:
-                            peak_heights[i] = bh
-                            peak_times[i] = now
-                        elif now - peak_times[i] > peak_hold:
-                            peak_heights[i] = bh
-                            peak_times[i] = now
+                    update_peaks(bar_heights, peak_heights, peak_times, now, peak_hold)
 
                 # draw spectrum
                 try:
-                    draw_spectrum(spectrum_win, bar_heights, peak_heights, bar_height, bar_character, peak_character, peaks, color, box)
+                    draw_spectrum(spectrum_win, bar_heights, peak_heights, bar_height, bar_character, peak_character, peaks, row_colors, box)
                 except curses.error:
-                    h, w = screen.getmaxyx()
-                    spectrum_win = draw_ui(screen, box, axes, min_freq, max_freq, min_db, max_db)
-                    bar_height, num_bars = spectrum_win.getmaxyx()
-                    band_edges = np.logspace(np.log10(min_freq), np.log10(max_freq), num_bars + 1)
-                    silence = np.repeat(-90, num_bars)
+                    spectrum_win, bar_height, bands, row_colors, bar_heights, peak_heights, peak_times, silence, scaled_db, raw_bar_heights = setup_spectrum(screen, box, axes, freqs, min_freq, max_freq, min_db, max_db, color)
 
     except Exception as e:
         if pw_loopback:
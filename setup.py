@@ -1,3 +1,4 @@
+import os
 import shutil
 
 import numpy
@@ -7,7 +8,12 @@ from setuptools import Extension, setup
 extra_compile_args = [
     "-flto",
     "-O3",
-    "-ffast-math",
+    "-fno-math-errno",
+    "-fno-trapping-math",
+    "-fno-signed-zeros",
+    "-fassociative-math",
+    "-freciprocal-math",
+    "-fopenmp-simd",
     "-fomit-frame-pointer",
     "-funroll-loops",
 ]
@@ -17,6 +23,22 @@ extra_link_args = [
     "-s",
 ]
 
+# optimize for cpu of this machine, binary will not be portable
+if os.environ.get("SPECTROTERM_NATIVE"):
+    extra_compile_args.extend(["-march=native", "-mtune=native"])
+
+# split band loop between threads, only pays off with many bars or large sample size
+if os.environ.get("SPECTROTERM_OPENMP"):
+    extra_compile_args.append("-fopenmp")
+    extra_link_args.append("-fopenmp")
+
+# profile guided optimization: "generate" builds instrumented code, "use" builds with collected profile
+pgo_mode = os.environ.get("SPECTROTERM_PGO")
+if pgo_mode in ("generate", "use"):
+    pgo_flag = f"-fprofile-{pgo_mode}={os.environ["SPECTROTERM_PGO_PATH"]}"
+    extra_compile_args.append(pgo_flag)
+    extra_link_args.append(pgo_flag)
+
 if shutil.which("lld"):
     extra_compile_args.append("-fuse-ld=lld")
     extra_link_args.append("-fuse-ld=lld")
@@ -34,5 +56,5 @@ extensions = [
 setup(
     name="spectroterm",
     packages=[],
-    ext_modules=cythonize(extensions, language_level=3),
+    ext_modules=cythonize(extensions, language_level=3, nthreads=os.cpu_count() or 1),
 )
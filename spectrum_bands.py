@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def get_bands(freqs, num_bands, min_freq, max_freq):
+    """Precompute fft bin indices and interpolation weights for splitting spectrum into logarithmic bands"""
+    num_bins = len(freqs)
+    band_edges = np.logspace(np.log10(min_freq), np.log10(max_freq), num_bands + 1)
+    edges = np.searchsorted(freqs, band_edges)
+    starts = edges[:num_bands]
+    counts = np.diff(edges)
+
+    # empty bands are interpolated between two nearest bins, weighted by distance to band center
+    left_bins = np.clip(starts - 1, 0, num_bins - 1)
+    right_bins = np.clip(starts, 0, num_bins - 1)
+    band_centers = (band_edges[:num_bands] + band_edges[1:]) / 2
+    left_weights = (starts > 0) / (np.abs(freqs[left_bins] - band_centers) + 1e-6)
+    right_weights = (starts < num_bins) / (np.abs(freqs[right_bins] - band_centers) + 1e-6)
+    weights_sum = left_weights + right_weights
+
+    return (
+        edges,
+        np.maximum(counts, 1),
+        counts == 0,
+        left_bins,
+        right_bins,
+        (left_weights / weights_sum).astype(np.float32),
+        (right_weights / weights_sum).astype(np.float32),
+        np.empty(num_bands, dtype=np.float32),   # output buffer reused between frames
+    )
@@ -1,76 +1,99 @@
 # cython: boundscheck=False, wraparound=False
-import curses
 import numpy as np
 cimport numpy as np
-from libc.math cimport log10, sqrt, fabs
-from pyfftw.interfaces.numpy_fft import rfft
+from cython.parallel cimport prange
+from libc.math cimport log10f
 
 
-cpdef np.ndarray log_band_volumes(
-    np.ndarray data,
-    np.ndarray freqs,
-    int num_bands,
-    np.ndarray band_edges,
-    float max_ref,
-):
-    """Get logarythmic volume in dB for specified number of bands, from sound sample, with interpolation between bands"""
-    cdef int i, b, left_bin, right_bin
-    cdef float center, band_center, d, wsum
-    cdef np.ndarray raw, raw_magnitude, magnitude, db, idx, bins, weights
-    cdef list py_bins
-    cdef np.float32_t left, right
-
-    raw = rfft(data, threads=1)
-    raw_magnitude = np.abs(raw)
-    magnitude = np.zeros(num_bands)
-
-    for i in range(num_bands):
-        left = <np.float32_t>band_edges[i]
-        right = <np.float32_t>band_edges[i + 1]
-        idx = (np.where((freqs >= left) & (freqs < right))[0])
-
-        if idx.shape[0] == 0:
-            left_bin = np.searchsorted(freqs, left)
-            right_bin = np.searchsorted(freqs, right)
-            py_bins = []
-            if left_bin > 0:
-                py_bins.append(left_bin - 1)
-            if left_bin < freqs.shape[0]:
-                py_bins.append(left_bin)
-            if right_bin > 0 and right_bin != left_bin:
-                py_bins.append(right_bin - 1)
-            if right_bin < freqs.shape[0] and right_bin != left_bin:
-                py_bins.append(right_bin)
-            bins = np.array(list(set(py_bins)), dtype=np.int32)
-
-            band_center = (left + right) / 2
-            weights = np.zeros(bins.shape[0], dtype=np.float32)
-            wsum = 0.0
-            for b in range(bins.shape[0]):
-                center = freqs[bins[b]]
-                d = fabs(center - band_center) + 1e-6
-                weights[b] = 1.0 / d
-                wsum += weights[b]
-            weights /= wsum
-
-            magnitude[i] = sqrt(np.sum((raw_magnitude[bins] ** 2) * weights))
-        else:
-            magnitude[i] = sqrt(np.mean(raw_magnitude[idx] ** 2))
-
-    db = 20.0 * np.log10(magnitude / max_ref + 1e-12)
-    return np.maximum(db, -90.0)
-
-
-cpdef int get_color(int y, int bar_height, bint use_color):
-    """Get color id by bar height"""
-    if not use_color:
-        return curses.color_pair(0)
-    cdef float relative = (bar_height - y) / bar_height
-    if relative < 0.5:
-        return curses.color_pair(1)
-    if relative < 0.8:
-        return curses.color_pair(2)
-    return curses.color_pair(3)
+cdef inline float _abs2(float complex z) noexcept nogil:
+    """Squared magnitude of complex number"""
+    return z.real * z.real + z.imag * z.imag
+
+
+cdef inline float _band_power(
+    const float complex[::1] spectrum,
+    const np.intp_t[::1] edges,
+    const np.intp_t[::1] counts,
+    const np.uint8_t[::1] empty,
+    const np.intp_t[::1] left_bins,
+    const np.intp_t[::1] right_bins,
+    const float[::1] left_weights,
+    const float[::1] right_weights,
+    Py_ssize_t b,
+) noexcept nogil:
+    """Mean power of bins in band, or weighted power of two nearest bins for empty band"""
+    cdef Py_ssize_t k
+    cdef float power = 0.0
+    if empty[b]:
+        return _abs2(spectrum[left_bins[b]]) * left_weights[b] + _abs2(spectrum[right_bins[b]]) * right_weights[b]
+    for k in range(edges[b], edges[b + 1]):
+        power += _abs2(spectrum[k])
+    return power / counts[b]
+
+
+cdef void _bands_db(
+    const float complex[::1] spectrum,
+    const np.intp_t[::1] edges,
+    const np.intp_t[::1] counts,
+    const np.uint8_t[::1] empty,
+    const np.intp_t[::1] left_bins,
+    const np.intp_t[::1] right_bins,
+    const float[::1] left_weights,
+    const float[::1] right_weights,
+    float log_ref,
+    float[::1] db,
+) noexcept nogil:
+    """
+    Band power, dB and clamp in single pass over fft output, 10*log10(power) is same as 20*log10(RMS)
+    Bands are independent, so they are split between threads when built with openmp
+    """
+    cdef Py_ssize_t b
+    cdef float power
+    for b in prange(counts.shape[0], schedule="static"):
+        power = _band_power(spectrum, edges, counts, empty, left_bins, right_bins, left_weights, right_weights, b)
+        db[b] = max(10.0 * log10f(power + 1e-12) - log_ref, -90.0)
+
+
+cpdef np.ndarray log_band_volumes(const float complex[::1] spectrum, tuple bands, float log_ref):
+    """
+    Get logarythmic volume in dB for precomputed bands, from fft of sound sample, with interpolation between bands
+    log_ref is reference maximum in dB, returned array is overwritten on next call with same bands
+    """
+    cdef const np.intp_t[::1] edges, counts, left_bins, right_bins
+    cdef const np.uint8_t[::1] empty
+    cdef const float[::1] left_weights, right_weights
+    cdef float[::1] db_view
+
+    edges, counts, empty_mask, left_bins, right_bins, left_weights, right_weights, db = bands
+    empty = empty_mask.view(np.uint8)
+    db_view = db
+    with nogil:
+        _bands_db(spectrum, edges, counts, empty, left_bins, right_bins, left_weights, right_weights, log_ref, db_view)
+    return db
+
+
+cpdef void fall_bars(np.int32_t[::1] bar_heights, const np.int32_t[::1] raw_bar_heights, int max_fall) noexcept:
+    """Lower bars by at most max_fall but not below new raw heights, in place"""
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(bar_heights.shape[0]):
+            bar_heights[i] = max(raw_bar_heights[i], bar_heights[i] - max_fall)
+
+
+cpdef void update_peaks(
+    const np.int32_t[::1] bar_heights,
+    np.int32_t[::1] peak_heights,
+    double[::1] peak_times,
+    double now,
+    double peak_hold,
+) noexcept:
+    """Reset peak markers to bar when bar is higher or hold time expired, in place"""
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(bar_heights.shape[0]):
+            if bar_heights[i] > peak_heights[i] or now - peak_times[i] > peak_hold:
+                peak_heights[i] = bar_heights[i]
+                peak_times[i] = now
 
 
 cpdef void draw_spectrum(
@@ -81,24 +104,27 @@ cpdef void draw_spectrum(
     str bar_character,
     str peak_character,
     bint peaks,
-    bint color,
+    list row_colors,
     bint box
 ):
     """Draw spectrum bars with peaks"""
-    cdef int y, x, bar, peak, i
+    cdef int y, x
     cdef int width = bar_heights.shape[0]
-    cdef list line
-
-    for y in range(bar_height - box):
-        line = [" "] * width
-        for i in range(width):
-            bar = bar_heights[i]
-            if y >= bar_height - bar:
-                line[i] = bar_character
-        if peaks:
-            for x in range(width):
-                peak = peak_heights[x]
-                if y == bar_height - peak:
-                    line[x] = peak_character
-        spectrum_win.insstr(y, 0, "".join(line), get_color(y, bar_height, color))
-        spectrum_win.refresh()
+    cdef int num_rows = bar_height - box
+    cdef Py_UCS4 bar_char = bar_character
+    cdef Py_UCS4 peak_char = peak_character
+    cdef np.ndarray grid = np.empty((num_rows, width), dtype=np.uint32)
+    cdef np.uint32_t[:, ::1] grid_view = grid
+
+    # fill character codes, then view each row as single fixed width string
+    for y in range(num_rows):
+        for x in range(width):
+            if peaks and y == bar_height - peak_heights[x]:
+                grid_view[y, x] = peak_char
+            elif y >= bar_height - bar_heights[x]:
+                grid_view[y, x] = bar_char
+            else:
+                grid_view[y, x] = 32   # space
+    for y, line in enumerate(grid.view(f"U{width}")[:, 0]):
+        spectrum_win.insstr(y, 0, line, row_colors[y])
+    spectrum_win.refresh()